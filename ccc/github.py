@@ -13,20 +13,34 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import atexit
 import datetime
 import enum
 import functools
+import hashlib
+import itertools
+import json
 import logging
+import os
+import queue
+import random
+import tempfile
+import threading
+import time
 import traceback
 import typing
 import urllib.parse
 
 import cachecontrol
+import cachecontrol.cache
+import cachecontrol.heuristics
+import cachetools
 import deprecated
 import gci.componentmodel as cm
 import github3
 import github3.github
 import github3.session
+import requests.adapters
 
 import ccc.elasticsearch
 import ci.util
@@ -38,17 +52,172 @@ import model.base
 
 logger = logging.getLogger(__name__)
 
+# selected credentials per github-cfg-name (determining remaining quota is expensive)
+_credentials_cache = cachetools.TTLCache(maxsize=8, ttl=60)
+_credentials_cache_lock = threading.Lock()
+# re-select credentials after observing less remaining requests
+_min_ratelimit_remaining = 200
+
+# determined once - log_stack_trace_information_hook is called for each response
+_running_on_ci = ci.util._running_on_ci()
+# fraction of responses for which stack trace information is stored (capturing is expensive)
+stack_trace_sampling_rate = 0.01
+
 
 class SessionAdapter(enum.Enum):
     NONE = None
     RETRY = 'retry'
     CACHE = 'cache'
+    ETAG = 'etag'
+
+
+class _BoundedInMemoryCache(cachecontrol.cache.BaseCache):
+    '''
+    thread-safe in-memory cache for cachecontrol, evicting least-recently-used entries once the
+    total size of cached (serialised) responses exceeds `max_octets`
+    '''
+    def __init__(self, max_octets: int):
+        self._lock = threading.Lock()
+        self._data = cachetools.LRUCache(maxsize=max_octets, getsizeof=len)
+
+    def get(self, key):
+        with self._lock:
+            return self._data.get(key)
+
+    def set(self, key, value, expires=None):
+        with self._lock:
+            try:
+                self._data[key] = value
+            except ValueError:
+                pass # value would exceed cache-size on its own - do not cache
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+
+class _CacheSlice(cachecontrol.cache.BaseCache):
+    '''
+    view on a cache, w/ keys prefixed by the given namespace (allows to keep entries for the same
+    urls separately in a shared cache)
+    '''
+    def __init__(self, cache: cachecontrol.cache.BaseCache, namespace: str):
+        self._cache = cache
+        self._namespace = namespace
+
+    def get(self, key):
+        return self._cache.get(f'{self._namespace}:{key}')
+
+    def set(self, key, value, expires=None):
+        self._cache.set(f'{self._namespace}:{key}', value)
+
+    def delete(self, key):
+        self._cache.delete(f'{self._namespace}:{key}')
+
+
+class _RevalidateHeuristic(cachecontrol.heuristics.BaseHeuristic):
+    '''
+    treats all responses as immediately stale (overriding GitHub's `Cache-Control: max-age=60`),
+    so cached responses are only served after revalidation (i.e. `304 Not Modified`)
+    '''
+    def update_headers(self, response):
+        return {'cache-control': 'max-age=0'}
+
+    def warning(self, response):
+        return None
+
+
+@functools.cache
+def _etag_cache():
+    '''
+    returns the (process-wide) cache backing SessionAdapter.ETAG
+
+    responses are only kept in memory (cached entries contain the `Authorization`-header GitHub
+    varies its responses on, i.e. tokens, so they must not be persisted). GitHub does not count
+    `304 Not Modified` responses against the rate-limit.
+    '''
+    return _BoundedInMemoryCache(max_octets=64 * 1024 * 1024)
+
+
+# http-adapters (and thus connection-pools) shared by sessions; keyed by (hostname, adapter)
+_http_adapters: dict[tuple[str, SessionAdapter], requests.adapters.HTTPAdapter] = {}
+_http_adapters_lock = threading.Lock()
+
+
+def _http_adapter(
+    hostname: str,
+    session_adapter: SessionAdapter,
+) -> requests.adapters.HTTPAdapter:
+    '''
+    returns the http-adapter to mount for the given hostname and session-adapter
+
+    Adapters are created once per process and shared between sessions (sessions themselves
+    cannot be shared, as github3 sets authentication and tls-validation on them), so there will
+    be only one connection-pool per github-host. Pools are enlarged (requests-default: 10), so
+    connections are reused if api-objects are shared between threads. Adapters for
+    SessionAdapter.ETAG are created per session (see _etag_http_adapter).
+    '''
+    key = (hostname.lower(), session_adapter)
+
+    with _http_adapters_lock:
+        if (adapter := _http_adapters.get(key)):
+            return adapter
+
+        if session_adapter is SessionAdapter.NONE or not session_adapter:
+            adapter = http_requests.default_adapter(
+                flags=http_requests.AdapterFlag(0),
+            )
+        elif session_adapter is SessionAdapter.RETRY:
+            adapter = http_requests.default_adapter(
+                flags=http_requests.AdapterFlag.RETRY,
+            )
+        elif session_adapter is SessionAdapter.CACHE:
+            adapter = http_requests.default_adapter(
+                flags=http_requests.AdapterFlag.CACHE,
+            )
+        else: # SessionAdapter.ETAG: see _etag_http_adapter
+            raise NotImplementedError
+
+        _http_adapters[key] = adapter
+        return adapter
+
+
+_etag_cache_slice_ids = itertools.count()
+
+
+def _etag_http_adapter(hostname: str) -> requests.adapters.HTTPAdapter:
+    '''
+    returns a new http-adapter for SessionAdapter.ETAG, intended to be mounted to exactly one
+    session (and thus used w/ one set of credentials)
+
+    cachecontrol stores only one entry per url. The authorization-header is set by github3 (from
+    the token passed to the c'tor), and GitHub's responses `Vary` on it. Hence, if adapters were
+    shared, each request w/ different credentials would replace the cached entry. Therefore,
+    each adapter uses a separate slice of the (bounded) process-wide cache, while the
+    connection-pools are still shared (see _http_adapter).
+
+    Responses are always revalidated, so no stale responses are served (e.g. after own writes).
+    '''
+    adapter = http_requests.default_adapter(
+        flags=http_requests.AdapterFlag.CACHE|http_requests.AdapterFlag.RETRY,
+        cache=_CacheSlice(
+            cache=_etag_cache(),
+            namespace=str(next(_etag_cache_slice_ids)),
+        ),
+        heuristic=_RevalidateHeuristic(),
+    )
+
+    shared_adapter = _http_adapter(hostname=hostname, session_adapter=SessionAdapter.RETRY)
+    adapter.poolmanager = shared_adapter.poolmanager
+    adapter.proxy_manager = shared_adapter.proxy_manager
+
+    return adapter
 
 
 def github_api_ctor(
     github_url: str,
     verify_ssl: bool=True,
-    session_adapter: SessionAdapter=SessionAdapter.RETRY,
+    session_adapter: SessionAdapter=SessionAdapter.ETAG,
 ):
     '''returns the appropriate github3.GitHub constructor for the given github URL
 
@@ -62,22 +231,15 @@ def github_api_ctor(
     else:
         raise ValueError('failed to parse url: ' + str(github_url))
 
-    session = github3.session.GitHubSession()
-    session_adapter = SessionAdapter(session_adapter)
-    if session_adapter is SessionAdapter.NONE or not session_adapter:
-        pass
-    elif session_adapter is SessionAdapter.RETRY:
-        session = http_requests.mount_default_adapter(
-            session=session,
-            flags=http_requests.AdapterFlag.RETRY,
-        )
-    elif session_adapter is SessionAdapter.CACHE:
-        session = cachecontrol.CacheControl(
-            session,
-            cache_etags=True,
-        )
+    if (session_adapter := SessionAdapter(session_adapter)) is SessionAdapter.ETAG:
+        adapter = _etag_http_adapter(hostname=hostname)
     else:
-        raise NotImplementedError
+        adapter = _http_adapter(hostname=hostname, session_adapter=session_adapter)
+
+    session = http_requests.mount_adapter(
+        session=github3.session.GitHubSession(),
+        adapter=adapter,
+    )
 
     if hostname.lower() == 'github.com':
         return functools.partial(
@@ -98,7 +260,7 @@ def repo_helper(
     org: str,
     repo: str,
     branch: str='master',
-    session_adapter: SessionAdapter=SessionAdapter.RETRY,
+    session_adapter: SessionAdapter=SessionAdapter.ETAG,
 ):
     api = github_api(
         github_cfg=github_cfg_for_repo_url(repo_url=ci.util.urljoin(host, org, repo)),
@@ -117,7 +279,7 @@ def pr_helper(
     host: str,
     org: str,
     repo: str,
-    session_adapter: SessionAdapter=SessionAdapter.RETRY,
+    session_adapter: SessionAdapter=SessionAdapter.ETAG,
 ):
     api = github_api(
         github_cfg=github_cfg_for_repo_url(repo_url=ci.util.urljoin(host, org, repo)),
@@ -138,7 +300,7 @@ github_repo_helper = repo_helper
 def github_api(
     github_cfg: 'model.GithubConfig'=None,
     repo_url: str=None,
-    session_adapter: SessionAdapter=SessionAdapter.RETRY,
+    session_adapter: SessionAdapter=SessionAdapter.ETAG,
     cfg_factory=None,
     username: typing.Optional[str]=None,
 ):
@@ -165,28 +327,112 @@ def github_api(
     if username:
         github_auth_token = github_cfg.credentials(username).auth_token()
     else:
-        github_auth_token = github_cfg.credentials_with_most_remaining_quota().auth_token()
+        github_auth_token = _credentials_with_most_remaining_quota(github_cfg).auth_token()
 
     verify_ssl = github_cfg.tls_validation()
 
+    return _github_api(
+        github_cfg_name=github_cfg.name(),
+        github_url=github_url,
+        api_url=github_cfg.api_url(),
+        verify_ssl=verify_ssl,
+        auth_token=github_auth_token,
+        session_adapter=SessionAdapter(session_adapter),
+    )
+
+
+def _credentials_with_most_remaining_quota(
+    github_cfg: model.github.GithubConfig,
+) -> model.github.GithubCredentials:
+    github_cfg_name = github_cfg.name()
+
+    with _credentials_cache_lock:
+        if (credentials := _credentials_cache.get(github_cfg_name)):
+            return credentials
+
+    credentials = github_cfg.credentials_with_most_remaining_quota()
+
+    with _credentials_cache_lock:
+        _credentials_cache[github_cfg_name] = credentials
+
+    return credentials
+
+
+def _invalidate_credentials_on_low_quota_hook(github_cfg_name: str):
+    def invalidate_credentials_on_low_quota(resp, *args, **kwargs):
+        # must not return anything (would replace response)
+        if not (remaining := resp.headers.get('X-RateLimit-Remaining')):
+            return
+
+        if int(remaining) < _min_ratelimit_remaining:
+            with _credentials_cache_lock:
+                _credentials_cache.pop(github_cfg_name, None)
+
+    return invalidate_credentials_on_low_quota
+
+
+@functools.cache
+def _github_api(
+    github_cfg_name: str,
+    github_url: str,
+    api_url: str,
+    verify_ssl: bool,
+    auth_token: str,
+    session_adapter: SessionAdapter,
+):
+    # api-objects (and their sessions / connection-pools) are reused for the process' lifetime;
+    # the key implicitly covers technical user (via token)
     github_ctor = github_api_ctor(
-        github_url=github_url, verify_ssl=verify_ssl,
+        github_url=github_url,
+        verify_ssl=verify_ssl,
         session_adapter=session_adapter,
     )
     github_api = github_ctor(
-        token=github_auth_token,
+        token=auth_token,
     )
 
     if not github_api:
         ci.util.fail("Could not connect to GitHub-instance {url}".format(url=github_url))
 
-    if not 'github.com' in github_cfg.api_url():
-        github_api._github_url = github_cfg.api_url()
+    if not 'github.com' in api_url:
+        github_api._github_url = api_url
+
+    github_api.session.hooks['response'].append(
+        _invalidate_credentials_on_low_quota_hook(github_cfg_name=github_cfg_name),
+    )
 
     return github_api
 
 
-@functools.lru_cache()
+# allow deliberate rotation (e.g. after credentials were changed)
+github_api.cache_clear = _github_api.cache_clear
+
+
+def _normalise_repo_url(repo_url: str) -> str:
+    '''
+    strips query, fragment, trailing slashes and `.git`-suffix and lowercases hostname, such
+    that different spellings of the same repository-url will result in the same cache-key.
+    scp-like urls (e.g. `git@github.com:org/repo`) are returned unchanged.
+    '''
+    parsed = ci.util.urlparse(repo_url)
+
+    try:
+        port = parsed.port
+    except ValueError:
+        return repo_url # not a valid port, e.g. scp-like url
+
+    netloc = parsed.hostname or ''
+    if port:
+        netloc = f'{netloc}:{port}'
+
+    path = parsed.path.rstrip('/').removesuffix('.git')
+
+    if not '://' in repo_url:
+        return f'{netloc}{path}'
+
+    return urllib.parse.urlunparse((parsed.scheme, netloc, path, '', '', ''))
+
+
 def github_cfg_for_repo_url(
     repo_url: typing.Union[str, urllib.parse.ParseResult],
     cfg_factory=None,
@@ -197,16 +443,135 @@ def github_cfg_for_repo_url(
     if isinstance(repo_url, urllib.parse.ParseResult):
         repo_url = repo_url.geturl()
 
+    return _github_cfg_for_repo_url(
+        repo_url=_normalise_repo_url(repo_url),
+        cfg_factory=cfg_factory,
+        require_labels=require_labels,
+    )
+
+
+# maps (hashed) lookup-parameters to github-cfg-names; shared between processes (e.g. cli-calls)
+_github_cfg_names_cache_path = os.path.expanduser(
+    os.path.join('~', '.cache', 'cc-utils', 'gh-cfg-map.json'),
+)
+_github_cfg_names_cache_ttl_seconds = 24 * 60 * 60
+_github_cfg_names_cache_lock = threading.Lock()
+
+
+def _github_cfg_names_cache_key(
+    repo_url: str,
+    cfg_factory,
+    require_labels: typing.Iterable[str],
+) -> typing.Optional[str]:
+    '''
+    returns a digest over the given lookup-parameters and github-cfgs known to the given
+    cfg_factory (thus changed cfgs will result in different keys), or `None` if no stable key
+    can be determined
+    '''
+    if not isinstance(cfg_factory, model.ConfigFactory):
+        return None
+
+    cfg_factory._retrieve_cfg_elements(cfg_type_name='github')
+    raw_github_cfgs = cfg_factory.raw.get('github', {})
+
+    return hashlib.sha256(
+        json.dumps(
+            (raw_github_cfgs, repo_url, sorted(require_labels)),
+            sort_keys=True,
+            default=str,
+        ).encode('utf-8')
+    ).hexdigest()
+
+
+def _is_valid_github_cfg_names_cache_entry(entry) -> bool:
+    # entries are pairs of github-cfg-name and timestamp
+    return isinstance(entry, list) \
+        and len(entry) == 2 \
+        and isinstance(entry[0], str) \
+        and isinstance(entry[1], (int, float)) \
+        and not isinstance(entry[1], bool)
+
+
+def _read_github_cfg_names_cache() -> dict:
+    '''
+    returns the (valid) entries from github-cfg-names cache. The cache-file is shared between
+    processes, so its contents are not trusted (invalid contents are treated as cache-misses)
+    '''
+    try:
+        with open(_github_cfg_names_cache_path) as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+    if not isinstance(cache, dict):
+        return {}
+
+    return {
+        key: entry for key, entry in cache.items()
+        if _is_valid_github_cfg_names_cache_entry(entry)
+    }
+
+
+def _cached_github_cfg_name(cache_key: str) -> typing.Optional[str]:
+    with _github_cfg_names_cache_lock:
+        cache = _read_github_cfg_names_cache()
+
+    if not (entry := cache.get(cache_key)):
+        return None
+
+    github_cfg_name, timestamp = entry
+    if time.time() - timestamp > _github_cfg_names_cache_ttl_seconds:
+        return None
+
+    return github_cfg_name
+
+
+def _store_github_cfg_name(cache_key: str, github_cfg_name: str):
+    now = time.time()
+
+    with _github_cfg_names_cache_lock:
+        cache = {
+            key: entry for key, entry in _read_github_cfg_names_cache().items()
+            if now - entry[1] <= _github_cfg_names_cache_ttl_seconds
+        }
+        cache[cache_key] = (github_cfg_name, now)
+
+        try:
+            cache_dir = os.path.dirname(_github_cfg_names_cache_path)
+            os.makedirs(cache_dir, exist_ok=True)
+            # replace atomically, as cache-file might be read by other processes concurrently
+            with tempfile.NamedTemporaryFile('w', dir=cache_dir, delete=False) as f:
+                json.dump(cache, f)
+            os.replace(f.name, _github_cfg_names_cache_path)
+        except OSError as ose:
+            logger.debug(f'failed to write github-cfg-names cache: {ose}')
+
+
+@functools.lru_cache(maxsize=1024)
+def _github_cfg_for_repo_url(
+    repo_url: str,
+    cfg_factory=None,
+    require_labels=('ci',),
+) -> typing.Optional[model.github.GithubConfig]:
     if not cfg_factory:
         cfg_factory = ci.util.ctx().cfg_factory()
 
+    require_labels = frozenset(require_labels or ())
+
+    # instantiating all github-cfgs is expensive - try to lookup result from previous runs
+    cache_key = _github_cfg_names_cache_key(
+        repo_url=repo_url,
+        cfg_factory=cfg_factory,
+        require_labels=require_labels,
+    )
+    if cache_key and (github_cfg_name := _cached_github_cfg_name(cache_key=cache_key)):
+        return cfg_factory.github(github_cfg_name)
+
     matching_cfgs = []
     for github_cfg in cfg_factory._cfg_elements(cfg_type_name='github'):
-        if require_labels:
-            missing_labels = set(require_labels) - set(github_cfg.purpose_labels())
-            if missing_labels:
-                # if not all required labels are present skip this element
-                continue
+        if require_labels and not require_labels.issubset(github_cfg.purpose_labels()):
+            # if not all required labels are present skip this element
+            continue
         if github_cfg.matches_repo_url(repo_url=repo_url):
             matching_cfgs.append(github_cfg)
 
@@ -218,11 +583,15 @@ def github_cfg_for_repo_url(
     gh_cfg = matching_cfgs[-1]
     # do not interfere with cli.py
     logger.info(f'using {gh_cfg.name()=} for {repo_url=}')
+
+    if cache_key:
+        _store_github_cfg_name(cache_key=cache_key, github_cfg_name=gh_cfg.name())
+
     return gh_cfg
 
 
 @deprecated.deprecated()
-@functools.lru_cache()
+@functools.lru_cache(maxsize=256)
 def github_cfg_for_hostname(
     host_name,
     cfg_factory=None,
@@ -252,23 +621,121 @@ def github_cfg_for_hostname(
     raise RuntimeError(f'no github_cfg for {host_name} with {require_labels}')
 
 
+@functools.cache
+def _stack_trace_elastic_client(config_set_name: str):
+    try:
+        config_set = ci.util.ctx().cfg_factory().cfg_set(config_set_name)
+    except KeyError:
+        # external concourse does not have config set 'internal_active'
+        return None
+
+    return ccc.elasticsearch.from_cfg(elasticsearch_cfg=config_set.elasticsearch())
+
+
+# enqueued (at exit) to have pending stack trace information stored
+_flush_stack_trace_information = object()
+
+
+def _store_stack_trace_information(
+    documents: queue.Queue,
+    config_set_name: str,
+    max_batch_size: int=100,
+    max_wait_seconds: float=2,
+):
+    '''
+    consumes documents from the given queue and stores them (in batches) in elastic search.
+    Intended to be run in a (daemon-)thread; returns after `_flush_stack_trace_information` was
+    consumed and all documents enqueued before were stored.
+    '''
+    els_index = 'github_access_stacktrace'
+
+    flushing = False
+    while not (flushing and documents.empty()):
+        batch = []
+        deadline = None
+
+        while len(batch) < max_batch_size:
+            try:
+                if flushing:
+                    document = documents.get_nowait()
+                elif deadline is None:
+                    document = documents.get() # wait for first document
+                    deadline = time.monotonic() + max_wait_seconds
+                elif (timeout := deadline - time.monotonic()) > 0:
+                    document = documents.get(timeout=timeout)
+                else:
+                    break
+            except queue.Empty:
+                break
+
+            if document is _flush_stack_trace_information:
+                flushing = True
+            else:
+                batch.append(document)
+
+        if not batch:
+            continue
+
+        try:
+            if not (elastic_client := _stack_trace_elastic_client(config_set_name)):
+                continue # do nothing (see above)
+
+            elastic_client.store_documents(
+                index=els_index,
+                body=batch,
+            )
+        except Exception as e:
+            ci.util.info(f'Could not log stack trace information: {e}')
+
+
+@functools.cache
+def _stack_trace_information_queue() -> queue.Queue:
+    '''
+    returns the queue consumed by a (lazily started) background thread storing stack trace
+    information in elastic search. Pending documents are stored at exit.
+    '''
+    documents = queue.Queue(maxsize=10000)
+
+    consumer = threading.Thread(
+        target=_store_stack_trace_information,
+        kwargs={
+            'documents': documents,
+            'config_set_name': ci.util.check_env('CONCOURSE_CURRENT_CFG'),
+        },
+        name='github-stacktrace-sink',
+        daemon=True,
+    )
+    consumer.start()
+
+    def flush(timeout_seconds: float=30):
+        try:
+            documents.put(_flush_stack_trace_information, timeout=timeout_seconds)
+        except queue.Full:
+            return
+        consumer.join(timeout=timeout_seconds)
+
+    atexit.register(flush)
+
+    return documents
+
+
 def log_stack_trace_information_hook(resp, *args, **kwargs):
     '''
     This function stores the current stacktrace in elastic search.
     It must not return anything, otherwise the return value is assumed to replace the response
+
+    Documents are only enqueued; they are stored asynchronously (in batches) by a background
+    thread, so requests are not delayed by additional round trips to elastic search. Only a
+    sample of responses is considered (see `stack_trace_sampling_rate`).
     '''
-    if not ci.util._running_on_ci():
+    if not _running_on_ci:
         return # early exit if not running in ci job
 
-    config_set_name = ci.util.check_env('CONCOURSE_CURRENT_CFG')
+    if random.random() >= stack_trace_sampling_rate:
+        return
+
     try:
-        els_index = 'github_access_stacktrace'
-        try:
-            config_set = ci.util.ctx().cfg_factory().cfg_set(config_set_name)
-        except KeyError:
-            # do nothing: external concourse does not have config set 'internal_active'
-            return
-        elastic_cfg = config_set.elasticsearch()
+        documents = _stack_trace_information_queue()
 
         now = datetime.datetime.utcnow()
         json_body = {
@@ -278,11 +745,16 @@ def log_stack_trace_information_hook(resp, *args, **kwargs):
             'stacktrace': traceback.format_stack()
         }
 
-        elastic_client = ccc.elasticsearch.from_cfg(elasticsearch_cfg=elastic_cfg)
-        elastic_client.store_document(
-            index=els_index,
-            body=json_body
-        )
+        while True:
+            try:
+                documents.put_nowait(json_body)
+                break
+            except queue.Full:
+                # drop oldest document
+                try:
+                    documents.get_nowait()
+                except queue.Empty:
+                    pass
 
     except Exception as e:
         ci.util.info(f'Could not log stack trace information: {e}')
@@ -1,8 +1,10 @@
+import atexit
 import concurrent.futures
 import dataclasses
 import enum
 import functools
 import logging
+import os
 import tarfile
 import tempfile
 import typing
@@ -20,6 +22,13 @@ import oci.model
 logger = logging.getLogger(__name__)
 ci.log.configure_default_logging()
 
+# shared by all image-scans (bounds amount of concurrent uploads to clamav-server)
+_SCAN_POOL = concurrent.futures.ThreadPoolExecutor(
+    max_workers=int(os.environ.get('CLAMAV_SCAN_CONCURRENCY', '5')),
+    thread_name_prefix='clamav-scan',
+)
+atexit.register(_SCAN_POOL.shutdown)
+
 
 class MalwareScanState(enum.Enum):
     FINISHED_SUCCESSFULLY = 'finished_successfully'
@@ -87,24 +96,33 @@ def aggregate_scan_result(
     upload_duration_seconds = 0
     findings = []
 
+    # bind to locals - results may contain thousands of elements (one per scanned file)
+    SCAN_FAILED = clamav.client.ScanStatus.SCAN_FAILED
+    OK = clamav.client.MalwareStatus.OK
+    UNKNOWN = clamav.client.MalwareStatus.UNKNOWN
+    FOUND_MALWARE = clamav.client.MalwareStatus.FOUND_MALWARE
+    add_finding = findings.append
+
     for result in results:
         count += 1
-        if result.status is clamav.client.ScanStatus.SCAN_FAILED:
+        if result.status is SCAN_FAILED:
             succeeded = False
             continue
 
-        scanned_octets += result.meta.scanned_octets
-        scan_duration_seconds += result.meta.scan_duration_seconds
-        upload_duration_seconds += result.meta.receive_duration_seconds
+        meta = result.meta
+        scanned_octets += meta.scanned_octets
+        scan_duration_seconds += meta.scan_duration_seconds
+        upload_duration_seconds += meta.receive_duration_seconds
 
-        if result.malware_status is clamav.client.MalwareStatus.OK:
+        malware_status = result.malware_status
+        if malware_status is OK:
             continue
-        elif result.malware_status is clamav.client.MalwareStatus.UNKNOWN:
+        elif malware_status is FOUND_MALWARE:
+            add_finding(result)
+        elif malware_status is UNKNOWN:
             raise ValueError('state cannot be unknown if scan succeeded')
-        elif result.malware_status is clamav.client.MalwareStatus.FOUND_MALWARE:
-            findings.append(result)
         else:
-            raise NotImplementedError(result.malware_status)
+            raise NotImplementedError(malware_status)
 
     if count == 0:
         raise ValueError('results-iterator did not contain any elements')
@@ -153,6 +171,19 @@ def scan_tarfile(
         yield scan_result
 
 
+@functools.lru_cache(maxsize=512)
+def _manifest_by_digest(
+    image_reference: str,
+    oci_client: oci.client.Client,
+) -> typing.Union[oci.model.OciImageManifest, oci.model.OciImageManifestList]:
+    # manifests referenced by digest are immutable, and may thus be reused (e.g. platform-specific
+    # sub-manifests shared by image-lists, or repeated scans of same image)
+    return oci_client.manifest(
+        image_reference=image_reference,
+        accept=oci.model.MimeTypes.prefer_multiarch,
+    )
+
+
 def _iter_layers(
     image_reference: typing.Union[str, oci.model.OciImageReference],
     oci_client: oci.client.Client,
@@ -164,10 +195,19 @@ def _iter_layers(
     in case of an image-list (aka multi-arch), referenced sub-manifests are resolved
     recursively
     '''
-    manifest = oci_client.manifest(
-        image_reference=image_reference,
-        accept=oci.model.MimeTypes.prefer_multiarch,
-    )
+    image_reference = oci.model.OciImageReference.to_image_ref(image_reference)
+
+    if image_reference.has_digest_tag:
+        manifest = _manifest_by_digest(
+            image_reference=str(image_reference),
+            oci_client=oci_client,
+        )
+    else:
+        manifest = oci_client.manifest(
+            image_reference=image_reference,
+            accept=oci.model.MimeTypes.prefer_multiarch,
+        )
+
     if isinstance(manifest, oci.model.OciImageManifest):
         yield from manifest.layers
         return
@@ -176,16 +216,23 @@ def _iter_layers(
         raise NotImplementedError(manifest)
 
     manifest: oci.model.OciImageManifestList
-    image_reference = oci.model.OciImageReference.to_image_ref(image_reference)
 
-    for manifest in manifest.manifests:
-        sub_manifest_img_ref = f'{image_reference.ref_without_tag}@{manifest.digest}'
+    sub_manifest_img_refs = [
+        f'{image_reference.ref_without_tag}@{manifest.digest}'
+        for manifest in manifest.manifests
+    ]
 
+    def resolve_layers(sub_manifest_img_ref: str):
         # recurse into (potentially) nested sub-images (typically there should be no nesting)
-        yield from _iter_layers(
+        return tuple(_iter_layers(
             image_reference=sub_manifest_img_ref,
             oci_client=oci_client,
-        )
+        ))
+
+    # retrieve sub-manifests concurrently (map preserves ordering)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
+        for layers in executor.map(resolve_layers, sub_manifest_img_refs):
+            yield from layers
 
 
 def scan_oci_image(
@@ -195,94 +242,99 @@ def scan_oci_image(
 ) -> typing.Generator[clamav.client.ScanResult, None, None]:
     layer_blobs = tuple(_iter_layers(image_reference=image_reference, oci_client=oci_client))
 
-    scan_func = functools.partial(
-        scan_oci_blob,
-        image_reference=image_reference,
-        oci_client=oci_client,
-        clamav_client=clamav_client,
-    )
-
-    if len(layer_blobs) > 1:
-        executor = concurrent.futures.ThreadPoolExecutor(max_workers=len(layer_blobs))
-
-        for res in executor.map(scan_func, layer_blobs):
-            yield from res
-    else:
-        yield from scan_func(blob_reference=layer_blobs[0])
-
-
-def scan_oci_blob(
-    blob_reference: oci.model.OciBlobRef,
-    image_reference: typing.Union[str, oci.model.OciImageReference],
-    oci_client: oci.client.Client,
-    clamav_client: clamav.client.ClamAVClient,
-) -> typing.Generator[clamav.client.ScanResult, None, None]:
-    try:
-        yield from scan_oci_blob_filewise(
+    def scan_func(blob_reference: oci.model.OciBlobRef):
+        # scan_oci_blob returns a generator - consume it in worker-thread, so scanning is
+        # actually done in parallel
+        return tuple(scan_oci_blob(
             blob_reference=blob_reference,
             image_reference=image_reference,
             oci_client=oci_client,
             clamav_client=clamav_client,
-        )
-    except tarfile.TarError as te:
-        logger.warning(f'{image_reference=} {te=} - falling back to layerwise scan')
+        ))
 
-        yield from scan_oci_blob_layerwise(
-            blob_reference=blob_reference,
+    if len(layer_blobs) > 1:
+        # yield in order of completion, so slow layers do not delay results of other layers
+        # (consumers, e.g. aggregate_scan_result, do not depend on ordering)
+        futures = [_SCAN_POOL.submit(scan_func, layer_blob) for layer_blob in layer_blobs]
+        for future in concurrent.futures.as_completed(futures):
+            yield from future.result()
+    else:
+        yield from scan_oci_blob(
+            blob_reference=layer_blobs[0],
             image_reference=image_reference,
             oci_client=oci_client,
             clamav_client=clamav_client,
         )
 
 
-def scan_oci_blob_filewise(
+def scan_oci_blob(
     blob_reference: oci.model.OciBlobRef,
     image_reference: typing.Union[str, oci.model.OciImageReference],
     oci_client: oci.client.Client,
     clamav_client: clamav.client.ClamAVClient,
-    chunk_size=8096,
+    chunk_size=1024 * 1024,
+    max_in_memory_octets=64 * 1024 * 1024,
 ) -> typing.Generator[clamav.client.ScanResult, None, None]:
     blob = oci_client.blob(
         image_reference=image_reference,
         digest=blob_reference.digest,
     )
+    name = f'{image_reference}:{blob_reference.digest}'
 
     # unfortunately, we need a backing tempfile, because we need a seekable filelike-obj for retry
-    with tempfile.TemporaryFile() as tmpfh:
+    # (and for falling back to layerwise scan w/o downloading blob again)
+    # keep small blobs in memory; larger ones are rolled over to disk
+    with tempfile.SpooledTemporaryFile(max_size=max_in_memory_octets) as tmpfh:
         for chunk in blob.iter_content(chunk_size=chunk_size):
             tmpfh.write(chunk)
 
         tmpfh.seek(0)
 
-        with tarfile.open(
-            fileobj=tmpfh,
-            mode='r',
-        ) as tf:
-            for tar_info in tf:
-                if not tar_info.isfile():
-                    continue
-                data = tf.extractfile(member=tar_info)
-
-                scan_result = clamav_client.scan(
-                    data=data,
-                    name=f'{image_reference}:{blob_reference.digest}:{tar_info.name}',
-                )
-                yield scan_result
-
-
-def scan_oci_blob_layerwise(
-    blob_reference: oci.model.OciBlobRef,
-    image_reference: typing.Union[str, oci.model.OciImageReference],
-    oci_client: oci.client.Client,
+        try:
+            yield from _scan_blob_filewise(
+                fileobj=tmpfh,
+                name=name,
+                clamav_client=clamav_client,
+            )
+        except tarfile.TarError as te:
+            logger.warning(f'{image_reference=} {te=} - falling back to layerwise scan')
+
+            tmpfh.seek(0)
+            yield from _scan_blob_layerwise(
+                fileobj=tmpfh,
+                name=name,
+                clamav_client=clamav_client,
+            )
+
+
+def _scan_blob_filewise(
+    fileobj: typing.BinaryIO,
+    name: str,
+    clamav_client: clamav.client.ClamAVClient,
+) -> typing.Generator[clamav.client.ScanResult, None, None]:
+    with tarfile.open(
+        fileobj=fileobj,
+        mode='r',
+    ) as tf:
+        for tar_info in tf:
+            if not tar_info.isfile():
+                continue
+            data = tf.extractfile(member=tar_info)
+
+            scan_result = clamav_client.scan(
+                data=data,
+                name=f'{name}:{tar_info.name}',
+            )
+            yield scan_result
+
+
+def _scan_blob_layerwise(
+    fileobj: typing.BinaryIO,
+    name: str,
     clamav_client: clamav.client.ClamAVClient,
 ) -> typing.Generator[clamav.client.ScanResult, None, None]:
-    blob = oci_client.blob(
-        image_reference=image_reference,
-        digest=blob_reference.digest,
-    )
-
     scan_result = clamav_client.scan(
-        data=blob.iter_content(chunk_size=tarfile.RECORDSIZE),
-        name=f'{image_reference}:{blob_reference.digest}',
+        data=iter(lambda: fileobj.read(tarfile.RECORDSIZE), b''),
+        name=name,
     )
     yield scan_result
@@ -13,11 +13,16 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import concurrent.futures
+import contextlib
 import dataclasses
 import functools
+import itertools
 import json
 import logging
 import os
+import re
+import typing
 import urllib.parse
 
 import github3
@@ -66,29 +71,43 @@ def _github_api_hostname(github_api) -> str:
         return 'github.com'
 
 
-def sync_org_webhooks(whd_deployment_cfg: WebhookDispatcherDeploymentConfig,):
+def sync_org_webhooks(
+    whd_deployment_cfg: WebhookDispatcherDeploymentConfig,
+    max_workers: int=5,
+):
     '''Syncs required organization webhooks for a given webhook dispatcher instance'''
 
-    for organization_name, github_api, webhook_url in \
-            _enumerate_required_org_webhooks(whd_deployment_cfg=whd_deployment_cfg):
-
+    def sync_org_webhook(organization_name: str, github_api, webhook_url: str):
         webhook_syncer = github.webhook.GithubWebHookSyncer(github_api)
-        failed_hooks = 0
-
-        try:
-            webhook_syncer.create_or_update_org_hook(
-                organization_name=organization_name,
-                events=whd_deployment_cfg.events(),
-                webhook_url=webhook_url,
-                skip_ssl_validation=False,
-            )
-            logger.info(
-                f'Created/updated organization hook on {_github_api_hostname(github_api)} '
-                f'for {organization_name=}: {webhook_url}'
-            )
-        except Exception as e:
-            failed_hooks += 1
-            logger.warning(f'{organization_name=} - error: {e}')
+
+        webhook_syncer.create_or_update_org_hook(
+            organization_name=organization_name,
+            events=whd_deployment_cfg.events(),
+            webhook_url=webhook_url,
+            skip_ssl_validation=False,
+        )
+        logger.info(
+            f'Created/updated organization hook on {_github_api_hostname(github_api)} '
+            f'for {organization_name=}: {webhook_url}'
+        )
+
+    failed_hooks = 0
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(sync_org_webhook, organization_name, github_api, webhook_url):
+                organization_name
+            for organization_name, github_api, webhook_url
+            in _enumerate_required_org_webhooks(whd_deployment_cfg=whd_deployment_cfg)
+        }
+
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                future.result()
+            except Exception as e:
+                failed_hooks += 1
+                organization_name = futures[future]
+                logger.warning(f'{organization_name=} - error: {e}')
 
     if failed_hooks != 0:
         logger.warning('Some webhooks could not be set - see above')
@@ -196,7 +215,8 @@ def has_metadata() -> bool:
     )
 
 
-@functools.lru_cache()
+# own build is one process-wide answer; bound cache in case of (varying) cfg_factory-instances
+@functools.lru_cache(maxsize=1)
 def find_own_running_build(cfg_factory=None):
     '''
     Determines the current build job running on concourse by relying on the "meta" contract (
@@ -231,27 +251,59 @@ def find_own_running_build(cfg_factory=None):
     # find ourself (assumption: there are only few running jobs in parallel at a given time)
     consider_builds = 20
     builds = client.job_builds(pipeline_metadata.pipeline_name, pipeline_metadata.job_name)
-    builds = [
-        build for build in builds
-        if build.status() is concourse.client.model.BuildStatus.RUNNING
-    ][:consider_builds]
+    builds = itertools.islice(
+        (
+            build for build in builds
+            if build.status() is concourse.client.model.BuildStatus.RUNNING
+        ),
+        consider_builds,
+    )
 
-    # avoid parsing too much output. usually, there will be only one line (our JSON output)
-    # sometimes (new image version is retrieved), there will be a few lines more.
     for build in builds:
         build_events = build.events()
         build_plan = build.plan()
         meta_task_id = build_plan.task_id(concourse.model.traits.meta.META_STEP_NAME)
 
-        # we expect output to only contain valid JSON
-        meta_output = ''.join(build_events.iter_buildlog(meta_task_id)).strip()
-
-        try:
-            uuid_json = json.loads(meta_output)
-        except json.decoder.JSONDecodeError:
-            logger.error(f'Error when parsing {meta_output=}')
+        if not (uuid_json := _read_meta_output(build_events=build_events, task_id=meta_task_id)):
             continue # ignore - we might still find "our" job
-        if uuid_json['uuid'] == build_job_uuid:
+
+        if uuid_json.get('uuid') == build_job_uuid:
             return build
     else:
         raise RuntimeError('Could not determine own Concourse job.')
+
+
+def _read_meta_output(
+    build_events: concourse.client.model.BuildEvents,
+    task_id: str,
+    max_lines: int=64,
+) -> typing.Optional[dict]:
+    '''
+    reads the build-log of the given (meta-)task until it contains a JSON document containing
+    a `uuid`, which is returned. Other JSON documents (e.g. output from image-retrieval) are
+    skipped. Returns `None` if no such document was found within the first `max_lines` lines.
+    '''
+    # avoid parsing too much output. usually, there will be only one JSON document (our output)
+    # sometimes (new image version is retrieved), there will be a few lines more.
+    decoder = json.JSONDecoder()
+    output = ''
+
+    with contextlib.closing(build_events.iter_buildlog(task_id)) as buildlog:
+        for chunk in buildlog:
+            output += chunk
+
+            # our document starts at beginning of a line
+            for match in re.finditer(r'^\s*{', output, flags=re.MULTILINE):
+                try:
+                    parsed, _ = decoder.raw_decode(output, match.end() - 1)
+                except json.decoder.JSONDecodeError:
+                    continue # document might not have been received completely, yet
+
+                if isinstance(parsed, dict) and 'uuid' in parsed:
+                    return parsed
+
+            if output.count('\n') > max_lines:
+                break
+
+    logger.error(f'Error when parsing {output=}')
+    return None
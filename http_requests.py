@@ -17,6 +17,8 @@ import functools
 import logging
 
 import cachecontrol
+import cachecontrol.cache
+import cachecontrol.heuristics
 import requests
 
 from requests.adapters import HTTPAdapter
@@ -72,15 +74,26 @@ class LoggingRetry(Retry):
 _default_retry_cfg = LoggingRetry()
 
 
-def mount_default_adapter(
-    session: requests.Session,
-    connection_pool_cache_size=32, # requests-library default
-    max_pool_size=32, # requests-library default
+def default_adapter(
+    connection_pool_cache_size=32, # requests-library default: 10
+    max_pool_size=32, # requests-library default: 10
     flags=AdapterFlag.CACHE|AdapterFlag.RETRY,
     retry_cfg: Retry=_default_retry_cfg,
-):
+    cache: cachecontrol.cache.BaseCache=None,
+    heuristic: cachecontrol.heuristics.BaseHeuristic=None,
+) -> HTTPAdapter:
+    '''
+    returns a new http-adapter. Adapters (and thus their connection-pools) may be shared
+    between multiple sessions. `cache` and `heuristic` are only honoured if the CACHE-flag
+    is set.
+    '''
     if AdapterFlag.CACHE in flags:
-        adapter_constructor = cachecontrol.CacheControlAdapter
+        adapter_constructor = functools.partial(
+            cachecontrol.CacheControlAdapter,
+            cache=cache,
+            cache_etags=True,
+            heuristic=heuristic,
+        )
     else:
         adapter_constructor = HTTPAdapter
 
@@ -90,17 +103,44 @@ def mount_default_adapter(
             max_retries=retry_cfg,
         )
 
-    default_http_adapter = adapter_constructor(
+    return adapter_constructor(
         pool_connections=connection_pool_cache_size,
         pool_maxsize=max_pool_size,
-
     )
-    session.mount('http://', default_http_adapter)
-    session.mount('https://', default_http_adapter)
+
+
+def mount_adapter(
+    session: requests.Session,
+    adapter: HTTPAdapter,
+):
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
 
     return session
 
 
+def mount_default_adapter(
+    session: requests.Session,
+    connection_pool_cache_size=32, # requests-library default: 10
+    max_pool_size=32, # requests-library default: 10
+    flags=AdapterFlag.CACHE|AdapterFlag.RETRY,
+    retry_cfg: Retry=_default_retry_cfg,
+    cache: cachecontrol.cache.BaseCache=None,
+):
+    default_http_adapter = default_adapter(
+        connection_pool_cache_size=connection_pool_cache_size,
+        max_pool_size=max_pool_size,
+        flags=flags,
+        retry_cfg=retry_cfg,
+        cache=cache,
+    )
+
+    return mount_adapter(
+        session=session,
+        adapter=default_http_adapter,
+    )
+
+
 def check_http_code(function):
     '''
     a decorator that will check on `requests.Response` instances returned by HTTP requests
@@ -14,6 +14,7 @@
 # limitations under the License.
 
 import os
+import threading
 import typing
 
 import kubernetes.client
@@ -21,6 +22,7 @@ from kubernetes import config, client
 from kubernetes.config.kube_config import KubeConfigLoader
 
 from ci.util import ctx as global_ctx, fail, existing_file, not_none
+import http_requests
 import model.kubernetes
 from kube.helper import (
     KubernetesConfigMapHelper,
@@ -43,7 +45,12 @@ class Ctx:
     either passed via CLI (--kubeconfig) or via env var KUBECONFIG.
     '''
 
+    # minimum connection-pool-size (kubernetes-client default: cpu-count * 5)
+    CONNECTION_POOL_MAXSIZE = 50
+
     def __init__(self, kubeconfig_dict: dict=None):
+        self._api_client = None
+        self._api_client_lock = threading.Lock()
         if not kubeconfig_dict:
             self.kubeconfig = None
             return
@@ -74,6 +81,7 @@ class Ctx:
         kubernetes.client.Configuration.set_default(configuration)
         # pylint: enable=no-member
         self.kubeconfig = configuration
+        self._api_client = None # re-create w/ new configuration
 
     def secret_helper(self) -> 'KubernetesSecretHelper':
         return KubernetesSecretHelper(self.create_core_api())
@@ -105,9 +113,37 @@ class Ctx:
     def rbac_helper(self) -> 'KubernetesRbacHelper':
         return KubernetesRbacHelper(self.create_rbac_api())
 
+    def shared_api_client(self) -> kubernetes.client.ApiClient:
+        '''
+        returns the `ApiClient` shared by all apis (and thus helpers) created from this ctx, so
+        they share one (enlarged) connection-pool, rather than each opening their own.
+        '''
+        with self._api_client_lock:
+            if self._api_client:
+                return self._api_client
+
+            if self.kubeconfig:
+                configuration = self.kubeconfig
+            else:
+                self.get_kubecfg() # loads kubeconfig into default configuration
+                # pylint: disable=no-member
+                configuration = kubernetes.client.Configuration.get_default_copy()
+                # pylint: enable=no-member
+
+            configuration.connection_pool_maxsize = max(
+                configuration.connection_pool_maxsize,
+                self.CONNECTION_POOL_MAXSIZE,
+            )
+            # kube-apiserver throttles (api priority and fairness) by responding w/ 429 and
+            # retry-after header; retry (idempotent requests) rather than failing
+            if configuration.retries is None:
+                configuration.retries = http_requests.LoggingRetry()
+            self._api_client = kubernetes.client.ApiClient(configuration=configuration)
+
+            return self._api_client
+
     def _create_api(self, api_constructor):
-        cfg = self.get_kubecfg()
-        return api_constructor(cfg)
+        return api_constructor(self.shared_api_client())
 
     def create_core_api(self):
         return self._create_api(client.CoreV1Api)
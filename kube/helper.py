@@ -12,15 +12,23 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
-import base64
+import binascii
+import concurrent.futures
+import copy
+import functools
 import json
+import logging
+import random
+import threading
 import time
 import typing
 
+import cachetools
+
 from urllib3.exceptions import ProtocolError
 
 import kubernetes
-from kubernetes import watch
+from kubernetes.watch.watch import iter_resp_lines
 from kubernetes.client import (
     AppsV1Api,
     CoreV1Api,
@@ -28,7 +36,6 @@ from kubernetes.client import (
     StorageV1Api,
     V1ConfigMap,
     V1Deployment,
-    V1LocalObjectReference,
     V1Namespace,
     V1ObjectMeta,
     V1PodList,
@@ -44,12 +51,149 @@ from kubernetes.client import (
     V1RoleBinding,
 )
 from kubernetes.client.rest import ApiException
-from kubernetes.stream import stream
+from kubernetes.stream import stream as kube_stream
 from ensure import ensure_annotations
 
 from ci.util import info, not_empty, not_none, fail
 from model.concourse import SecretNamePattern
 
+logger = logging.getLogger(__name__)
+
+
+def _execute_concurrently(
+    functions: typing.Iterable[typing.Callable[[], typing.Any]],
+    max_workers: int=8,
+) -> list:
+    '''
+    executes the given (argument-less) functions using a thread-pool and returns their results
+    (in order of the passed functions). After all functions were executed, the exception raised
+    by the first failed function (if any) is re-raised.
+
+    Helpers issue blocking requests against kube-apiserver - running independent requests
+    concurrently (the underlying urllib3-pool is thread-safe) avoids paying for their RTTs
+    one after another.
+    '''
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(function) for function in functions]
+
+    return [future.result() for future in futures]
+
+
+def _patch_namespaced_object(
+    api_client: kubernetes.client.ApiClient,
+    resource_path: str,
+    name: str,
+    namespace: str,
+    body,
+    content_type: str,
+    response_type: str,
+    query_params: typing.List[typing.Tuple[str, typing.Any]]=None,
+):
+    '''patches the specified object using the given content-type (i.e. patch-strategy)
+
+    kubernetes-client (<24) does not allow to choose the content-type for patch-requests, hence
+    the request is issued using (the thread-safe) ApiClient.call_api. Note that bodies for
+    non-json content-types must be passed pre-serialised.
+    '''
+    return api_client.call_api(
+        resource_path, 'PATCH',
+        path_params={'name': name, 'namespace': namespace},
+        query_params=query_params or [],
+        header_params={
+            'Accept': 'application/json',
+            'Content-Type': content_type,
+        },
+        body=body,
+        response_type=response_type,
+        auth_settings=['BearerToken'],
+        _return_http_data_only=True,
+    )
+
+
+def _b64encode(value) -> str:
+    '''returns the base64-encoding of the given value (bytes are encoded as-is, other values
+    are converted into a str, which is encoded as utf-8)
+    '''
+    if not isinstance(value, (bytes, bytearray)):
+        value = str(value).encode('utf-8')
+    return binascii.b2a_base64(value, newline=False).decode('ascii')
+
+
+def _merge_patch(target, patch):
+    '''returns the result of applying the given json-merge-patch (RFC 7386) to target (both
+    are left unchanged)
+    '''
+    if not isinstance(patch, dict):
+        return patch
+    if not isinstance(target, dict):
+        target = {}
+
+    merged = dict(target)
+    for key, value in patch.items():
+        if value is None:
+            merged.pop(key, None)
+        else:
+            merged[key] = _merge_patch(target.get(key), value)
+
+    return merged
+
+
+def _contains_patch_directives(patch) -> bool:
+    if isinstance(patch, dict):
+        return any(
+            str(key).startswith('$') or _contains_patch_directives(value)
+            for key, value in patch.items()
+        )
+    if isinstance(patch, list):
+        return any(_contains_patch_directives(value) for value in patch)
+    return False
+
+
+def provision_gcr_image_pull_secret(
+    core_api: CoreV1Api,
+    namespace: str,
+    secret_name: str,
+    service_account_name: str,
+    password: str,
+    email: str,
+    **gcr_secret_kwargs,
+):
+    '''ensures the given namespace exists, creates a gcr-secret in it and patches the secret as
+    image-pull-secret into the specified service-account.
+
+    creating the secret and patching the service-account only depend on the namespace (the
+    reference to the secret is resolved by name), so those are done concurrently. Additional
+    keyword-arguments are passed to `KubernetesSecretHelper.create_gcr_secret`.
+    '''
+    not_empty(namespace)
+    not_empty(secret_name)
+    not_empty(service_account_name)
+
+    KubernetesNamespaceHelper(core_api).create_if_absent(namespace)
+
+    secret_helper = KubernetesSecretHelper(core_api)
+    service_account_helper = KubernetesServiceAccountHelper(core_api)
+
+    _execute_concurrently(
+        functions=(
+            functools.partial(
+                secret_helper.create_gcr_secret,
+                namespace=namespace,
+                name=secret_name,
+                password=password,
+                email=email,
+                **gcr_secret_kwargs,
+            ),
+            functools.partial(
+                service_account_helper.patch_image_pull_secret_into_service_account,
+                name=service_account_name,
+                namespace=namespace,
+                image_pull_secret_name=secret_name,
+            ),
+        ),
+        max_workers=2,
+    )
+
 
 class KubernetesSecretHelper:
     '''Helper class for handling kubernetes secret objects'''
@@ -74,18 +218,17 @@ class KubernetesSecretHelper:
           gcr_secret=password
         )
 
-        docker_config = {
-          server_url: {
-            'username': user_name,
-            'email': email,
-            'password': password,
-            'auth': base64.b64encode(auth.encode('utf-8')).decode('utf-8')
-          }
-        }
+        # schema is fixed - only json-encode values (equivalent to json.dumps of the resp. dict)
+        docker_config = (
+          f'{{{json.dumps(server_url)}: {{'
+          f'"username": {json.dumps(user_name)}, '
+          f'"email": {json.dumps(email)}, '
+          f'"password": {json.dumps(password)}, '
+          f'"auth": "{_b64encode(auth)}"'
+          '}}'
+        )
 
-        encoded_docker_config = base64.b64encode(
-          json.dumps(docker_config).encode('utf-8')
-        ).decode('utf-8')
+        encoded_docker_config = _b64encode(docker_config)
 
         secret.data = {
           '.dockercfg': encoded_docker_config
@@ -105,7 +248,7 @@ class KubernetesSecretHelper:
         the secret's contents are expected in a dictionary containing only scalar values.
         In particular, each value is converted into a str; the result returned from
         to-str conversion is encoded as a utf-8 byte array. Thus such a conversion must
-        not have done before.
+        not have done before. As an exception, bytes (and bytearray) values are used as-is.
         '''
         if not bool(data) ^ bool(raw_data):
             raise ValueError('Exactly one data or raw data has to be set')
@@ -114,28 +257,36 @@ class KubernetesSecretHelper:
         metadata = V1ObjectMeta(name=ne(name), namespace=ne(namespace))
 
         if data:
-            raw_data = {
-                k: base64.b64encode(str(v).encode('utf-8')).decode('utf-8')
-                for k,v in data.items()
-            }
+            raw_data = {k: _b64encode(v) for k,v in data.items()}
 
         secret = V1Secret(metadata=metadata, data=raw_data)
 
-        # find out whether we have to replace or to create
+        # optimistically replace (secret usually exists) - create only if absent
         try:
-            self.core_api.read_namespaced_secret(name=name, namespace=namespace)
-            secret_exists = True
+            self.core_api.replace_namespaced_secret(name=name, namespace=namespace, body=secret)
         except ApiException as ae:
             # only 404 is expected
             if not ae.status == 404:
                 raise ae
-            secret_exists = False
-
-        if secret_exists:
-            self.core_api.replace_namespaced_secret(name=name, namespace=namespace, body=secret)
-        else:
             self.core_api.create_namespaced_secret(namespace=namespace, body=secret)
 
+    def put_secrets(
+        self,
+        secrets: typing.Iterable[typing.Tuple[str, dict]],
+        namespace: str='default',
+        max_workers: int=8,
+    ):
+        '''creates or updates (replaces) the given secrets (pairs of name and data) concurrently.
+        see `put_secret` for details.
+        '''
+        _execute_concurrently(
+            functions=(
+                functools.partial(self.put_secret, name=name, data=data, namespace=namespace)
+                for name, data in secrets
+            ),
+            max_workers=max_workers,
+        )
+
     def get_secret(self, name: str, namespace: str) -> V1Secret:
         '''Returns the `V1Secret` with the given name in the given namespace, or `None`'''
         try:
@@ -182,15 +333,49 @@ class KubernetesServiceAccountHelper:
         namespace: str,
         image_pull_secret_name: str
       ):
-        '''Patches the given (by name) image-pull-secret into the specified service-account.'''
-        service_account = V1ServiceAccount()
-        reference = V1LocalObjectReference()
-        reference.name = image_pull_secret_name
-        service_account.image_pull_secrets = [reference]
-        self.core_api.patch_namespaced_service_account(
+        '''Patches the given (by name) image-pull-secret into the specified service-account.
+
+        uses server-side apply (w/ field-manager `cc-utils`), i.e. only the owned field is sent
+        and merged by kube-apiserver.
+        '''
+        body = {
+            'apiVersion': 'v1',
+            'kind': 'ServiceAccount',
+            'metadata': {'name': name, 'namespace': namespace},
+            'imagePullSecrets': [{'name': image_pull_secret_name}],
+        }
+        _patch_namespaced_object(
+            api_client=self.core_api.api_client,
+            resource_path='/api/v1/namespaces/{namespace}/serviceaccounts/{name}',
             name=name,
             namespace=namespace,
-            body=service_account
+            body=json.dumps(body), # yaml is a superset of json
+            content_type='application/apply-patch+yaml',
+            response_type='V1ServiceAccount',
+            query_params=[('fieldManager', 'cc-utils'), ('force', True)],
+        )
+
+    def patch_image_pull_secret_into_service_accounts(
+        self,
+        names: typing.Iterable[str],
+        namespace: str,
+        image_pull_secret_name: str,
+        max_workers: int=8,
+    ):
+        '''Patches the given (by name) image-pull-secret into the specified service-accounts
+        (concurrently).
+        '''
+        _execute_concurrently(
+            functions=(
+                functools.partial(
+                    self.patch_image_pull_secret_into_service_account,
+                    name=name,
+                    namespace=namespace,
+                    image_pull_secret_name=image_pull_secret_name,
+                )
+                for name in names
+            ),
+            max_workers=max_workers,
         )
 
     def get_service_account(
@@ -231,6 +416,11 @@ class KubernetesServiceAccountHelper:
             )
 
 
+# (api-server-url, namespace-name) of namespaces known to exist
+_existing_namespaces = cachetools.TTLCache(maxsize=256, ttl=60)
+_existing_namespaces_lock = threading.Lock()
+
+
 class KubernetesNamespaceHelper:
     '''Helper class for kubernetes namespace objects'''
 
@@ -245,28 +435,43 @@ class KubernetesNamespaceHelper:
         ns = V1Namespace(metadata=metadata)
         return self.core_api.create_namespace(ns)
 
+    def _namespace_cache_key(self, namespace: str):
+        return (self.core_api.api_client.configuration.host, namespace)
+
     def create_if_absent(self, namespace: str):
-        '''Create a new namespace iff it does not already exist'''
+        '''Create a new namespace iff it does not already exist
+
+        namespaces known to exist (i.e. found or created) are remembered for some time, so
+        repeated calls do not issue requests against kube-apiserver.
+        '''
         not_empty(namespace)
 
+        cache_key = self._namespace_cache_key(namespace)
+        with _existing_namespaces_lock:
+            if cache_key in _existing_namespaces:
+                return
+
         existing_namespace = self.get_namespace(namespace)
         if not existing_namespace:
             self.create_namespace(namespace)
 
-    @ensure_annotations
+        with _existing_namespaces_lock:
+            _existing_namespaces[cache_key] = True
+
     def delete_namespace(self, namespace: str):
         not_empty(namespace)
+        with _existing_namespaces_lock:
+            _existing_namespaces.pop(self._namespace_cache_key(namespace), None)
         self.core_api.delete_namespace(name=namespace, body={})
 
     def get_namespace(self, namespace: str):
         '''Returns the `V1Namespace` corresponding to the given name, or `None`'''
-        for ns in self.core_api.list_namespace().items:
-            # check if 'tis our namespace
-            name = ns.metadata.name
-            if not name == namespace:
-                continue
-            return ns
-        return None
+        try:
+            return self.core_api.read_namespace(name=namespace)
+        except ApiException as ae:
+            if ae.status == 404:
+                return None
+            raise ae
 
 
 class KubernetesServiceHelper:
@@ -279,27 +484,49 @@ class KubernetesServiceHelper:
 
         service_name = service.metadata.name
         if self.get_service(name=service_name, namespace=namespace):
-            func = self.core_api.api_client.select_header_content_type
-            self.core_api.api_client.select_header_content_type = lambda content_types: 'application/merge-patch+json' # noqa: E501
-            self.core_api.patch_namespaced_service(
+            # use merge-patch (api-client is shared, so it must not be monkey-patched)
+            _patch_namespaced_object(
+                api_client=self.core_api.api_client,
+                resource_path='/api/v1/namespaces/{namespace}/services/{name}',
                 name=service_name,
                 namespace=namespace,
                 body=service,
+                content_type='application/merge-patch+json',
+                response_type='V1Service',
             )
-            self.core_api.api_client.select_header_content_type = func
         else:
             self.create_service(namespace=namespace,service=service)
 
     def replace_or_create_service(self, namespace: str, service: V1Service):
         '''Create a service in a given namespace. If the service already exists,
-        the previous version will be deleted beforehand
+        it will be replaced (in-place, thus retaining its cluster-ip). If the replacement is
+        rejected as invalid (e.g. because immutable fields would change), the previous version
+        will be deleted beforehand. The passed service is not modified.
         '''
         not_empty(namespace)
         not_none(service)
 
         service_name = service.metadata.name
         existing_service = self.get_service(namespace=namespace, name=service_name)
-        if existing_service:
+        if not existing_service:
+            self.create_service(namespace=namespace, service=service)
+            return
+
+        # services do not allow for unconditional updates - resource-version is required
+        replacement = copy.deepcopy(service)
+        replacement.metadata.resource_version = existing_service.metadata.resource_version
+        if replacement.spec and not replacement.spec.cluster_ip:
+            replacement.spec.cluster_ip = existing_service.spec.cluster_ip
+
+        try:
+            self.core_api.replace_namespaced_service(
+                namespace=namespace,
+                name=service_name,
+                body=replacement,
+            )
+        except ApiException as ae:
+            if not ae.status == 422: # unprocessable entity
+                raise ae
             delete_options = kubernetes.client.V1DeleteOptions()
             delete_options.grace_period_seconds = 0
             self.core_api.delete_namespaced_service(
@@ -307,7 +534,7 @@ class KubernetesServiceHelper:
                 name=service_name,
                 body=delete_options,
             )
-        self.create_service(namespace=namespace, service=service)
+            self.create_service(namespace=namespace, service=service)
 
     def create_service(self, namespace: str, service: V1Service):
         '''Create a service in a given namespace. Raises an `ApiException` if such a Service
@@ -351,32 +578,46 @@ class KubernetesDeploymentHelper:
 
         deployment_name = deployment.metadata.name
         if self.get_deployment(namespace=namespace, name=deployment_name):
-            func = self.apps_api.api_client.select_header_content_type
-
-            # monkey patch function to set the correct merge strategy for request.
-            # This will apply all changes and remove unnecessary config
-            self.apps_api.api_client.select_header_content_type = lambda content_types: 'application/merge-patch+json' # noqa: E501
-            self.apps_api.patch_namespaced_deployment(deployment_name, namespace, deployment)
-            self.apps_api.api_client.select_header_content_type = func
+            # use merge-patch to apply all changes and remove unnecessary config
+            # (api-client is shared, so it must not be monkey-patched)
+            _patch_namespaced_object(
+                api_client=self.apps_api.api_client,
+                resource_path='/apis/apps/v1/namespaces/{namespace}/deployments/{name}',
+                name=deployment_name,
+                namespace=namespace,
+                body=deployment,
+                content_type='application/merge-patch+json',
+                response_type='V1Deployment',
+            )
         else:
             self.create_deployment(namespace=namespace, deployment=deployment)
 
     def replace_or_create_deployment(self, namespace: str, deployment: V1Deployment):
         '''Create a deployment in a given namespace. If the deployment already exists,
-        the previous version will be deleted beforehand.
+        it will be replaced in-place. If the replacement is rejected as invalid (e.g. because
+        immutable fields, such as `spec.selector`, would change), the previous version will be
+        deleted beforehand.
         '''
         not_empty(namespace)
         not_none(deployment)
 
         deployment_name = deployment.metadata.name
-        existing_deployment = self.get_deployment(namespace=namespace, name=deployment_name)
-        if existing_deployment:
-            self.apps_api.delete_namespaced_deployment(
+        try:
+            self.apps_api.replace_namespaced_deployment(
                 namespace=namespace,
                 name=deployment_name,
-                body=kubernetes.client.V1DeleteOptions()
+                body=deployment,
             )
-        self.create_deployment(namespace=namespace, deployment=deployment)
+        except ApiException as ae:
+            if ae.status == 422: # unprocessable entity
+                self.apps_api.delete_namespaced_deployment(
+                    namespace=namespace,
+                    name=deployment_name,
+                    body=kubernetes.client.V1DeleteOptions()
+                )
+            elif not ae.status == 404:
+                raise ae
+            self.create_deployment(namespace=namespace, deployment=deployment)
 
     def create_deployment(self, namespace: str, deployment: V1Deployment):
         '''Create a deployment in a given namespace. Raises an `ApiException` if such a deployment
@@ -406,9 +647,18 @@ class KubernetesDeploymentHelper:
         not_empty(namespace)
         not_empty(body)
 
-        if not self.get_deployment(namespace, name):
+        if not (deployment := self.get_deployment(namespace, name)):
             fail(f'Deployment {name} in namespace {namespace} does not exist')
 
+        # skip patches that would not change the deployment (avoid needless writes and
+        # reconciliations). Strategic-merge-patches yield the same result as json-merge-patches
+        # if the latter do not change anything (unless patch-directives are used)
+        if not _contains_patch_directives(body):
+            current = self.apps_api.api_client.sanitize_for_serialization(deployment)
+            if _merge_patch(current, body) == current:
+                logger.info(f'{name=} in {namespace=} is up-to-date - not patched')
+                return
+
         self.apps_api.patch_namespaced_deployment(name, namespace, body)
 
     def wait_until_deployment_available(self, namespace: str, name: str, timeout_seconds: int=60):
@@ -418,29 +668,71 @@ class KubernetesDeploymentHelper:
         not_empty(namespace)
         not_empty(name)
 
-        w = watch.Watch()
+        def is_available(deployment: V1Deployment):
+            return deployment.status is not None \
+                and deployment.status.available_replicas is not None \
+                and deployment.status.available_replicas > 0
+
+        end_time = time.time() + timeout_seconds
+
+        # fast path: deployment might already be available
+        resource_version = None
+        if (deployment := self.get_deployment(namespace=namespace, name=name)):
+            if is_available(deployment):
+                return True
+            # only watch for changes after our read
+            resource_version = deployment.metadata.resource_version
+
+        backoff_seconds = 0.5
         # Work around IncompleteRead errors resulting in ProtocolErrors - no fault of our own
-        start_time = int(time.time())
-        while (start_time + timeout_seconds) > time.time():
+        while (remaining_seconds := end_time - time.time()) > 0:
             try:
-                for event in w.stream(
-                    self.apps_api.list_namespaced_deployment,
+                # only watch our deployment; process raw events (we only need a few fields, so
+                # skip deserialisation into V1Deployment, as done by kubernetes.watch.Watch)
+                response = self.apps_api.list_namespaced_deployment(
                     namespace=namespace,
-                    timeout_seconds=timeout_seconds
-                ):
-                    deployment_spec = event['object']
-                    if deployment_spec is not None:
-                        if deployment_spec.metadata.name == name:
-                            if deployment_spec.status.available_replicas is not None \
-                                    and deployment_spec.status.available_replicas > 0:
-                                return True
-                    # Check explicitly if timeout occurred
-                    if (start_time + timeout_seconds) < time.time():
+                    field_selector=f'metadata.name={name}',
+                    resource_version=resource_version,
+                    timeout_seconds=max(int(remaining_seconds), 1),
+                    watch=True,
+                    _preload_content=False,
+                )
+                try:
+                    for line in iter_resp_lines(response):
+                        backoff_seconds = 0.5
+                        event = json.loads(line)
+                        raw_deployment = event['object']
+                        if event['type'] == 'ERROR':
+                            if raw_deployment.get('code') == 410:
+                                # resource-version expired - (re-)start watching from current state
+                                resource_version = None
+                                break
+                            raise ApiException(
+                                status=raw_deployment.get('code'),
+                                reason=f'{raw_deployment.get("reason")}: '
+                                    f'{raw_deployment.get("message")}',
+                            )
+                        status = raw_deployment.get('status') or {}
+                        if (status.get('availableReplicas') or 0) > 0:
+                            return True
+                        resource_version = raw_deployment['metadata']['resourceVersion']
+                        # Check explicitly if timeout occurred
+                        if end_time < time.time():
+                            return False
+                    else:
+                        # Regular watch-timeout occurred, no need for further checks
                         return False
-                # Regular Watch.stream() timeout occurred, no need for further checks
-                return False
+                finally:
+                    response.close()
+                    response.release_conn()
             except ProtocolError:
-                info('http connection error - ignored')
+                # do not hammer kube-apiserver by re-connecting in a tight loop
+                delay_seconds = backoff_seconds * (0.5 + random.random())
+                info(f'http connection error - will retry in {delay_seconds:.1f}s')
+                time.sleep(max(min(delay_seconds, end_time - time.time()), 0))
+                backoff_seconds = min(backoff_seconds * 2, 8)
+
+        return False
 
     def get_stateful_set(self, namespace: str, name: str) -> V1StatefulSet:
         '''Return the `V1StatefulSet` with the given name in the given namespace, or `None` if
@@ -466,20 +758,29 @@ class KubernetesIngressHelper:
 
     def replace_or_create_ingress(self, namespace: str, ingress: NetworkingV1Api):
         '''Create an ingress in a given namespace. If the ingress already exists,
-        the previous version will be deleted beforehand.
+        it will be replaced in-place. If the replacement is rejected as invalid (e.g. because
+        immutable fields would change), the previous version will be deleted beforehand.
         '''
         not_empty(namespace)
         not_none(ingress)
 
         ingress_name = ingress.metadata.name
-        existing_ingress = self.get_ingress(namespace=namespace, name=ingress_name)
-        if existing_ingress:
-            self.extensions_v1beta1_api.delete_namespaced_ingress(
+        try:
+            self.extensions_v1beta1_api.replace_namespaced_ingress(
                 namespace=namespace,
                 name=ingress_name,
-                body=kubernetes.client.V1DeleteOptions()
+                body=ingress,
             )
-        self.create_ingress(namespace=namespace, ingress=ingress)
+        except ApiException as ae:
+            if ae.status == 422: # unprocessable entity
+                self.extensions_v1beta1_api.delete_namespaced_ingress(
+                    namespace=namespace,
+                    name=ingress_name,
+                    body=kubernetes.client.V1DeleteOptions()
+                )
+            elif not ae.status == 404:
+                raise ae
+            self.create_ingress(namespace=namespace, ingress=ingress)
 
     def create_ingress(self, namespace: str, ingress: NetworkingV1Api):
         '''Create an ingress in a given namespace. Raises an `ApiException` if such an ingress
@@ -582,6 +883,46 @@ class KubernetesPodHelper:
             raise ae
         return pods
 
+    def list_pod_names(
+        self,
+        namespace: str,
+        label_selector: str='',
+        field_selector: str='',
+    ) -> typing.List[str]:
+        '''Return the names of all pods matching given labels and/or fields in the given namespace
+
+        only pods' metadata is requested (PartialObjectMetadataList), so kube-apiserver does not
+        transmit (and we do not need to deserialise) the pods' specs and statuses.
+        '''
+        not_empty(namespace)
+
+        query_params = [
+            (param_name, value) for param_name, value in (
+                ('labelSelector', label_selector),
+                ('fieldSelector', field_selector),
+            ) if value
+        ]
+
+        # kubernetes-client (<24) does not allow to choose the accept-header for list-requests
+        try:
+            response = self.core_api.api_client.call_api(
+                '/api/v1/namespaces/{namespace}/pods', 'GET',
+                path_params={'namespace': namespace},
+                query_params=query_params,
+                header_params={
+                    'Accept': 'application/json;as=PartialObjectMetadataList;g=meta.k8s.io;v=v1',
+                },
+                auth_settings=['BearerToken'],
+                _return_http_data_only=True,
+                _preload_content=False,
+            )
+        except ApiException as ae:
+            if ae.status == 404:
+                return None
+            raise ae
+
+        return [item['metadata']['name'] for item in json.loads(response.data)['items']]
+
     def delete_pod(self, name: str, namespace: str, grace_period_seconds: int=0):
         '''Delete a pod in the given namespace.
         grace_period_seconds: the duration in seconds before the object should be deleted.
@@ -609,9 +950,13 @@ class KubernetesPodHelper:
         stdout:bool=True,
         stdin='Not implemented',
         tty='Not implemented',
+        stream: bool=False,
     ):
         '''Exec a command on a given pod in a given namespace. Does not support redirection of
         stdin or allocation of a tty.
+
+        If `stream` is set, a generator is returned instead of the command's (entire) output,
+        yielding pairs of channel (`stdout` or `stderr`) and output-chunk as they are received.
         '''
         not_empty(name)
         not_empty(namespace)
@@ -620,9 +965,15 @@ class KubernetesPodHelper:
         if stdin != 'Not implemented' or tty != 'Not implemented':
             raise NotImplementedError
 
+        # kubernetes.stream.stream replaces the api-client's `request` for the duration of the
+        # call - use a dedicated client, as our api-client may be shared (see kube.ctx.Ctx)
+        exec_api = CoreV1Api(
+            kubernetes.client.ApiClient(configuration=self.core_api.api_client.configuration),
+        )
+
         try:
-            response = stream(
-                self.core_api.connect_post_namespaced_pod_exec,
+            response = kube_stream(
+                exec_api.connect_post_namespaced_pod_exec,
                 name,
                 namespace,
                 command=command,
@@ -631,12 +982,28 @@ class KubernetesPodHelper:
                 stdin=False,
                 stdout=stdout,
                 tty=False,
+                _preload_content=not stream,
             )
         except ApiException as ae:
             if ae.status == 404:
                 return None
             raise ae
-        return response
+
+        if not stream:
+            return response
+
+        def iter_output():
+            try:
+                while response.is_open():
+                    response.update(timeout=1)
+                    if response.peek_stdout():
+                        yield 'stdout', response.read_stdout()
+                    if response.peek_stderr():
+                        yield 'stderr', response.read_stderr()
+            finally:
+                response.close()
+
+        return iter_output()
 
 
 class KubernetesStorageClassHelper:
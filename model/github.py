@@ -125,15 +125,14 @@ class GithubConfig(NamedModelElement):
     def matches_repo_url(self, repo_url):
         parsed_repo_url = ci.util.urlparse(repo_url)
 
-        if not self.repo_urls():
+        if not (repo_url_regexes := self.repo_urls()):
             return self.matches_hostname(host_name=parsed_repo_url.hostname)
 
         repo_url = ci.util.urljoin(parsed_repo_url.hostname, parsed_repo_url.path)
-        for repo_url_regex in self.repo_urls():
-            if re.fullmatch(repo_url_regex, repo_url):
-                return True
-
-        return False
+        return any(
+            re.fullmatch(repo_url_regex, repo_url)
+            for repo_url_regex in repo_url_regexes
+        )
 
     def _optional_attributes(self):
         return (
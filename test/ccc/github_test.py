@@ -0,0 +1,306 @@
+# Copyright (c) 2019-2020 SAP SE or an SAP affiliate company. All rights reserved. This file is
+# licensed under the Apache Software License, v. 2 except as noted otherwise in the LICENSE file
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import collections
+import http.server
+import json
+import queue
+import threading
+import time
+import types
+
+import pytest
+import requests
+
+import ccc.github as examinee
+import http_requests
+import model
+import model.github
+
+
+@pytest.mark.parametrize(
+    'repo_url,expected',
+    [
+        ('github.com/org/repo', 'github.com/org/repo'),
+        ('github.com/org/repo/', 'github.com/org/repo'),
+        ('github.com/org/repo.git', 'github.com/org/repo'),
+        ('github.com/org/repo.git/', 'github.com/org/repo'),
+        ('GitHub.com/org/Repo', 'github.com/org/Repo'),
+        ('github.com:8080/org/repo', 'github.com:8080/org/repo'),
+        ('https://github.com/org/repo', 'https://github.com/org/repo'),
+        ('https://GITHUB.com/org/repo.git/', 'https://github.com/org/repo'),
+        ('https://github.com/org/repo?tab=readme#top', 'https://github.com/org/repo'),
+        ('github.com/org/repo?tab=readme#top', 'github.com/org/repo'),
+        ('git@github.com:org/repo.git', 'git@github.com:org/repo.git'), # scp-like: unchanged
+    ],
+)
+def test_normalise_repo_url(repo_url, expected):
+    assert examinee._normalise_repo_url(repo_url) == expected
+
+
+def test_github_cfg_for_repo_url_accepts_scp_like_urls():
+    github_cfg = model.github.GithubConfig(
+        name='a_github',
+        raw_dict={
+            'httpUrl': 'https://github.com',
+            'available_protocols': ['https'],
+            'purpose_labels': ['ci'],
+        },
+        type_name='github',
+    )
+
+    class CfgFactory:
+        def _cfg_elements(self, cfg_type_name):
+            return (github_cfg,)
+
+    cfg_factory = CfgFactory()
+
+    assert examinee.github_cfg_for_repo_url(
+        repo_url='git@github.com:org/repo.git',
+        cfg_factory=cfg_factory,
+    ) is github_cfg
+
+
+@pytest.fixture
+def github_cfg_names_cache_path(tmp_path, monkeypatch):
+    cache_path = tmp_path / 'gh-cfg-map.json'
+    monkeypatch.setattr(examinee, '_github_cfg_names_cache_path', str(cache_path))
+    return cache_path
+
+
+def test_github_cfg_names_cache(github_cfg_names_cache_path):
+    assert examinee._cached_github_cfg_name(cache_key='key') is None # absent file
+
+    examinee._store_github_cfg_name(cache_key='key', github_cfg_name='a_github')
+    assert examinee._cached_github_cfg_name(cache_key='key') == 'a_github'
+    assert examinee._cached_github_cfg_name(cache_key='other_key') is None
+
+    # expired entries are ignored, and pruned upon next write
+    expired = time.time() - examinee._github_cfg_names_cache_ttl_seconds - 1
+    github_cfg_names_cache_path.write_text(json.dumps({'key': ['a_github', expired]}))
+    assert examinee._cached_github_cfg_name(cache_key='key') is None
+
+    examinee._store_github_cfg_name(cache_key='other_key', github_cfg_name='other_github')
+    assert json.loads(github_cfg_names_cache_path.read_text()).keys() == {'other_key'}
+
+
+@pytest.mark.parametrize(
+    'contents',
+    [
+        'no json',
+        '[]',
+        '{"key": "a_github"}',
+        '{"key": ["a_github"]}',
+        '{"key": [42, 42]}',
+        '{"key": ["a_github", "not-a-timestamp"]}',
+    ],
+)
+def test_github_cfg_names_cache_ignores_invalid_contents(github_cfg_names_cache_path, contents):
+    github_cfg_names_cache_path.write_text(contents)
+
+    assert examinee._cached_github_cfg_name(cache_key='key') is None
+
+    examinee._store_github_cfg_name(cache_key='other_key', github_cfg_name='a_github')
+    assert examinee._cached_github_cfg_name(cache_key='other_key') == 'a_github'
+
+
+def test_github_cfg_for_repo_url_w_invalid_cache(github_cfg_names_cache_path):
+    cfg_factory = model.ConfigFactory.from_dict({
+        'cfg_types': {
+            'github': {
+                'model': {
+                    'cfg_type_name': 'github',
+                    'type': 'GithubConfig',
+                    'factory_method': 'github',
+                },
+            },
+        },
+        'github': {
+            'a_github': {
+                'httpUrl': 'https://github.com',
+                'available_protocols': ['https'],
+                'purpose_labels': ['ci'],
+            },
+        },
+    })
+    github_cfg_names_cache_path.write_text('[]')
+
+    def github_cfg_for_repo_url():
+        examinee._github_cfg_for_repo_url.cache_clear() # only consider on-disk cache
+        return examinee.github_cfg_for_repo_url(
+            repo_url='github.com/org/repo',
+            cfg_factory=cfg_factory,
+        )
+
+    assert github_cfg_for_repo_url().name() == 'a_github' # full scan
+    assert len(json.loads(github_cfg_names_cache_path.read_text())) == 1
+    assert github_cfg_for_repo_url().name() == 'a_github' # from on-disk cache
+
+
+@pytest.fixture
+def etag_server():
+    requests_by_token = collections.defaultdict(list) # token -> [If-None-Match]
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            token = self.headers.get('Authorization')
+            requests_by_token[token].append(self.headers.get('If-None-Match'))
+
+            etag = f'"{token}"'
+            if self.headers.get('If-None-Match') == etag:
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.end_headers()
+                return
+
+            body = json.dumps({'token': token}).encode('utf-8')
+            self.send_response(200)
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', 'private, max-age=60')
+            self.send_header('Vary', 'Accept, Authorization')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    yield f'http://127.0.0.1:{server.server_port}/user', requests_by_token
+
+    server.shutdown()
+
+
+def test_etag_http_adapter_keeps_cached_responses_per_token(etag_server, caplog):
+    url, requests_by_token = etag_server
+
+    def session(token: str):
+        session = requests.Session()
+        session.headers['Authorization'] = token
+        return http_requests.mount_adapter(
+            session=session,
+            adapter=examinee._etag_http_adapter(hostname='127.0.0.1'),
+        )
+
+    session1 = session('t1')
+    session2 = session('t2')
+
+    # connection-pools are shared, though
+    assert session1.get_adapter(url).poolmanager is session2.get_adapter(url).poolmanager
+
+    for _ in range(2):
+        assert session1.get(url).json() == {'token': 't1'}
+        assert session2.get(url).json() == {'token': 't2'}
+
+    # second requests were revalidated (i.e. cached entries were not replaced by other token's)
+    assert requests_by_token == {'t1': [None, '"t1"'], 't2': [None, '"t2"']}
+    assert not [r for r in caplog.records if 'deserialization failed' in r.getMessage()]
+
+
+class ElasticClientMock:
+    def __init__(self):
+        self.batches = []
+        self.stored = threading.Event()
+
+    def store_documents(self, index, body):
+        self.batches.append(list(body))
+        self.stored.set()
+
+
+@pytest.fixture
+def elastic_client(monkeypatch):
+    elastic_client = ElasticClientMock()
+    monkeypatch.setattr(
+        examinee,
+        '_stack_trace_elastic_client',
+        lambda config_set_name: elastic_client,
+    )
+    return elastic_client
+
+
+def test_store_stack_trace_information_batches_and_flushes(elastic_client):
+    documents = queue.Queue()
+    for i in range(257):
+        documents.put(i)
+    documents.put(examinee._flush_stack_trace_information)
+
+    consumer = threading.Thread(
+        target=examinee._store_stack_trace_information,
+        kwargs={'documents': documents, 'config_set_name': 'a_cfg_set'},
+        daemon=True,
+    )
+    consumer.start()
+    consumer.join(timeout=10)
+
+    assert not consumer.is_alive() # returns after flush
+    assert [len(batch) for batch in elastic_client.batches] == [100, 100, 57]
+    assert sum(elastic_client.batches, []) == list(range(257))
+
+
+def test_store_stack_trace_information_stores_incomplete_batches(elastic_client):
+    documents = queue.Queue()
+    threading.Thread(
+        target=examinee._store_stack_trace_information,
+        kwargs={'documents': documents, 'config_set_name': 'a_cfg_set', 'max_wait_seconds': 0.1},
+        daemon=True,
+    ).start()
+
+    for i in range(3):
+        documents.put(i)
+
+    # stored after deadline passed, although batch is incomplete (and no flush was requested)
+    assert elastic_client.stored.wait(timeout=10)
+    assert elastic_client.batches == [[0, 1, 2]]
+
+
+def test_stack_trace_information_is_flushed_at_exit(elastic_client, monkeypatch):
+    exit_handlers = []
+    monkeypatch.setattr(examinee.atexit, 'register', exit_handlers.append)
+    monkeypatch.setenv('CONCOURSE_CURRENT_CFG', 'a_cfg_set')
+
+    examinee._stack_trace_information_queue.cache_clear()
+    try:
+        documents = examinee._stack_trace_information_queue()
+        for i in range(7):
+            documents.put(i)
+
+        assert len(exit_handlers) == 1
+        exit_handlers[0]() # blocks until pending documents were stored
+
+        assert sum(elastic_client.batches, []) == list(range(7))
+        assert documents.empty()
+    finally:
+        examinee._stack_trace_information_queue.cache_clear()
+
+
+def test_log_stack_trace_information_hook_drops_oldest(monkeypatch):
+    documents = queue.Queue(maxsize=2)
+    monkeypatch.setattr(examinee, '_running_on_ci', True)
+    monkeypatch.setattr(examinee, 'stack_trace_sampling_rate', 1)
+    monkeypatch.setattr(examinee, '_stack_trace_information_queue', lambda: documents)
+
+    for i in range(3):
+        response = types.SimpleNamespace(
+            url=f'https://api.github.com/{i}',
+            request=types.SimpleNamespace(method='GET'),
+        )
+        examinee.log_stack_trace_information_hook(response)
+
+    assert [documents.get_nowait()['url'] for _ in range(2)] == [
+        'https://api.github.com/1',
+        'https://api.github.com/2',
+    ]
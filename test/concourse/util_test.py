@@ -12,6 +12,9 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import json
+import types
+
 import concourse.util as examinee
 
 
@@ -39,3 +42,33 @@ def test_static_pipeline_metadata(monkeypatch):
     pipeline_metadata = examinee.get_pipeline_metadata()
 
     assert pipeline_metadata == test_metadata
+
+
+def test_read_meta_output():
+    meta_output = json.dumps({'uuid': 'made-up-uuid'}, indent=2)
+
+    def iter_buildlog(task_id):
+        yield 'pulling image {not json}\n'
+        yield '{"status": "pulling image"}\n' # json-document w/o uuid
+        # document may be split across multiple chunks
+        for i in range(0, len(meta_output), 4):
+            yield meta_output[i:i+4]
+
+    build_events = types.SimpleNamespace(iter_buildlog=iter_buildlog)
+
+    assert examinee._read_meta_output(
+        build_events=build_events,
+        task_id='made-up-task-id',
+    ) == {'uuid': 'made-up-uuid'}
+
+    def iter_buildlog(task_id):
+        while True:
+            yield 'no json\n'
+
+    build_events = types.SimpleNamespace(iter_buildlog=iter_buildlog)
+
+    assert examinee._read_meta_output(
+        build_events=build_events,
+        task_id='made-up-task-id',
+        max_lines=5,
+    ) is None
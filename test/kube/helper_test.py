@@ -0,0 +1,187 @@
+# Copyright (c) 2019-2020 SAP SE or an SAP affiliate company. All rights reserved. This file is
+# licensed under the Apache Software License, v. 2 except as noted otherwise in the LICENSE file
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from unittest.mock import MagicMock
+
+import pytest
+from kubernetes.client import (
+    ApiClient,
+    V1Container,
+    V1Deployment,
+    V1DeploymentSpec,
+    V1LabelSelector,
+    V1ObjectMeta,
+    V1PodSpec,
+    V1PodTemplateSpec,
+    V1Service,
+    V1ServicePort,
+    V1ServiceSpec,
+)
+from kubernetes.client.rest import ApiException
+
+import kube.helper as examinee
+
+
+@pytest.fixture
+def apps_api():
+    deployment = V1Deployment(
+        api_version='apps/v1',
+        kind='Deployment',
+        metadata=V1ObjectMeta(name='a_deployment', namespace='a_namespace', labels={'a': 'b'}),
+        spec=V1DeploymentSpec(
+            replicas=1,
+            selector=V1LabelSelector(match_labels={'a': 'b'}),
+            template=V1PodTemplateSpec(
+                spec=V1PodSpec(
+                    containers=[V1Container(name='a_container', image='an_image:1')],
+                ),
+            ),
+        ),
+    )
+
+    apps_api = MagicMock()
+    apps_api.api_client = ApiClient()
+    apps_api.read_namespaced_deployment.return_value = deployment
+
+    return apps_api
+
+
+def patch_deployment(apps_api, body: dict):
+    examinee.KubernetesDeploymentHelper(apps_api).patch_deployment(
+        name='a_deployment',
+        namespace='a_namespace',
+        body=body,
+    )
+
+
+@pytest.mark.parametrize(
+    'body',
+    [
+        {'spec': {'replicas': 1}},
+        {'metadata': {'labels': {'a': 'b'}}},
+        {'metadata': {'annotations': None}}, # removal of absent attribute
+        {'spec': {'template': {'spec': {
+            'containers': [{'name': 'a_container', 'image': 'an_image:1'}],
+        }}}},
+    ],
+)
+def test_patch_deployment_skips_unchanged(apps_api, body):
+    patch_deployment(apps_api, body)
+
+    apps_api.patch_namespaced_deployment.assert_not_called()
+
+
+@pytest.mark.parametrize(
+    'body',
+    [
+        {'spec': {'replicas': 2}}, # changed scalar
+        {'metadata': {'labels': {'a': None}}}, # deletion
+        {'spec': {'template': {'spec': {
+            'containers': [{'name': 'a_container', 'image': 'an_image:2'}],
+        }}}}, # replaced list
+        {'spec': {'template': {'spec': {
+            'containers': [{'name': 'a_container'}],
+        }}}}, # partial list-entry
+        {'spec': {'template': {'spec': {
+            'containers': [{'name': 'a_container', 'image': 'an_image:1', '$patch': 'replace'}],
+        }}}}, # patch-directive
+        {'$retainKeys': ['spec'], 'spec': {'replicas': 1}}, # patch-directive
+    ],
+)
+def test_patch_deployment_sends_changes(apps_api, body):
+    patch_deployment(apps_api, body)
+
+    apps_api.patch_namespaced_deployment.assert_called_once_with(
+        'a_deployment',
+        'a_namespace',
+        body,
+    )
+
+
+def test_merge_patch():
+    target = {'a': 1, 'b': {'c': 2, 'd': [1, 2]}}
+
+    assert examinee._merge_patch(target, {'b': {'c': None}}) == {'a': 1, 'b': {'d': [1, 2]}}
+    assert examinee._merge_patch(target, {'b': {'d': [3]}}) == {'a': 1, 'b': {'c': 2, 'd': [3]}}
+    assert examinee._merge_patch(target, {'e': {'f': 1}}) == target | {'e': {'f': 1}}
+    # target must not be modified
+    assert target == {'a': 1, 'b': {'c': 2, 'd': [1, 2]}}
+
+
+def test_contains_patch_directives():
+    assert examinee._contains_patch_directives({'a': [{'$patch': 'delete'}]})
+    assert examinee._contains_patch_directives({'$setElementOrder/a': []})
+    assert not examinee._contains_patch_directives({'a': [{'b': '$c'}], 'd': None})
+
+
+def test_replace_or_create_service_does_not_modify_service():
+    service = V1Service(
+        metadata=V1ObjectMeta(name='a_service'),
+        spec=V1ServiceSpec(ports=[V1ServicePort(port=80)]),
+    )
+    existing_service = V1Service(
+        metadata=V1ObjectMeta(name='a_service', resource_version='42'),
+        spec=V1ServiceSpec(cluster_ip='10.0.0.1', ports=[V1ServicePort(port=80)]),
+    )
+    core_api = MagicMock()
+    core_api.read_namespaced_service.return_value = existing_service
+
+    examinee.KubernetesServiceHelper(core_api).replace_or_create_service(
+        namespace='a_namespace',
+        service=service,
+    )
+
+    replacement = core_api.replace_namespaced_service.call_args.kwargs['body']
+    assert replacement.metadata.resource_version == '42'
+    assert replacement.spec.cluster_ip == '10.0.0.1'
+
+    assert service.metadata.resource_version is None
+    assert service.spec.cluster_ip is None
+
+
+@pytest.mark.parametrize(
+    'replace_status,deleted',
+    [
+        (404, False), # absent - create
+        (422, True), # invalid (e.g. immutable field changed) - delete and create
+    ],
+)
+def test_replace_or_create_deployment_falls_back(apps_api, replace_status, deleted):
+    deployment = apps_api.read_namespaced_deployment.return_value
+    apps_api.replace_namespaced_deployment.side_effect = ApiException(status=replace_status)
+
+    examinee.KubernetesDeploymentHelper(apps_api).replace_or_create_deployment(
+        namespace='a_namespace',
+        deployment=deployment,
+    )
+
+    assert apps_api.delete_namespaced_deployment.called is deleted
+    apps_api.create_namespaced_deployment.assert_called_once_with(
+        namespace='a_namespace',
+        body=deployment,
+    )
+
+
+def test_replace_or_create_deployment_raises_other_errors(apps_api):
+    apps_api.replace_namespaced_deployment.side_effect = ApiException(status=500)
+
+    with pytest.raises(ApiException):
+        examinee.KubernetesDeploymentHelper(apps_api).replace_or_create_deployment(
+            namespace='a_namespace',
+            deployment=apps_api.read_namespaced_deployment.return_value,
+        )
+
+    apps_api.delete_namespaced_deployment.assert_not_called()
+    apps_api.create_namespaced_deployment.assert_not_called()